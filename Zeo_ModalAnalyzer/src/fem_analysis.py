@@ -1,20 +1,28 @@
+import warnings
 import numpy as np
 import scipy.sparse as sp
-from scipy.sparse.linalg import eigsh
+from solvers import solve_eigenproblem
 
 class FEMPlateModalAnalysis:
     """
     Performs FEM modal analysis for 2D rectangular plates using Kirchhoff plate theory.
     
+    Material and section properties may be given per element: each of E, nu,
+    rho and thickness accepts a scalar (uniform plate), an array with one value
+    per element (length nx*ny, or shape (ny, nx) in mesh order), or a callable
+    f(x, y) evaluated on the element centroids.
+    
     Attributes:
         length (float): Plate length in meters
         width (float): Plate width in meters
         nx (int): Number of elements in x-direction
         ny (int): Number of elements in y-direction
-        E (float): Young's modulus in Pascals
-        nu (float): Poisson's ratio
-        rho (float): Material density in kg/m³
-        thickness (float): Plate thickness in meters
+        E (float, array or callable): Young's modulus in Pascals
+        nu (float, array or callable): Poisson's ratio
+        rho (float, array or callable): Material density in kg/m³
+        thickness (float, array or callable): Plate thickness in meters
+        E_elem, nu_elem, rho_elem, t_elem (ndarray): Per-element property values
+        D (ndarray): Per-element flexural rigidity
     """
     
     def __init__(self, length, width, nx, ny, E, nu, rho, thickness):
@@ -28,28 +36,51 @@ class FEMPlateModalAnalysis:
         self.thickness = thickness
         
         # Precomputed values
-        self.D = E * thickness**3 / (12 * (1 - nu**2))  # Flexural rigidity
         self.num_nodes = (nx + 1) * (ny + 1)
         self.num_elements = nx * ny
         self.nodes = None
         self.elements = None
+        self.solver_backend = None
         self.dx = length / nx
         self.dy = width / ny
         
+        # Per-element properties
+        self.E_elem = self._element_field(E, 'E')
+        self.nu_elem = self._element_field(nu, 'nu')
+        self.rho_elem = self._element_field(rho, 'rho')
+        self.t_elem = self._element_field(thickness, 'thickness')
+        self.D = self.E_elem * self.t_elem**3 / (12 * (1 - self.nu_elem**2))  # Flexural rigidity
+        
+    def element_centroids(self):
+        """Return (x, y) centroid coordinates of all elements in mesh order"""
+        return element_centroids(self.length, self.width, self.nx, self.ny)
+        
+    def _element_field(self, value, name):
+        """Resolve a scalar, array or callable property to one value per element"""
+        if callable(value):
+            value = value(*self.element_centroids())
+        field = np.asarray(value, dtype=float)
+        if field.ndim == 0:
+            return np.full(self.num_elements, float(field))
+        if field.shape == (self.ny, self.nx):
+            field = field.ravel()
+        if field.shape != (self.num_elements,):
+            raise ValueError(
+                f"{name} must be a scalar, a callable or an array with "
+                f"{self.num_elements} values, got shape {field.shape}"
+            )
+        return field
+        
     def generate_mesh(self):
         """Generate structured quadrilateral mesh"""
         x = np.linspace(0, self.length, self.nx + 1)
         y = np.linspace(0, self.width, self.ny + 1)
-        self.nodes = np.array([[xi, yi] for yi in y for xi in x])
-        
-        self.elements = []
-        for j in range(self.ny):
-            for i in range(self.nx):
-                n1 = j * (self.nx + 1) + i
-                n2 = j * (self.nx + 1) + i + 1
-                n3 = (j + 1) * (self.nx + 1) + i + 1
-                n4 = (j + 1) * (self.nx + 1) + i
-                self.elements.append([n1, n2, n3, n4])
+        X, Y = np.meshgrid(x, y)
+        self.nodes = np.column_stack([X.ravel(), Y.ravel()])
+        
+        i, j = np.meshgrid(np.arange(self.nx), np.arange(self.ny))
+        n1 = (j * (self.nx + 1) + i).ravel()
+        self.elements = np.column_stack([n1, n1 + 1, n1 + self.nx + 2, n1 + self.nx + 1])
                 
     def apply_boundary_conditions(self, fixed_edges):
         """Identify fixed nodes based on selected edges"""
@@ -66,10 +97,13 @@ class FEMPlateModalAnalysis:
             
         return sorted(fixed_nodes)
     
-    def compute_element_matrices(self):
-        """Compute consistent mass and stiffness matrices for plate elements"""
+    def unit_element_matrices(self):
+        """
+        Element matrices per unit property: stiffness per unit flexural rigidity
+        and mass per unit areal mass (rho * thickness).
+        """
         # Consistent mass matrix for plate element
-        me = self.rho * self.thickness * self.dx * self.dy / 36 * np.array([
+        me_unit = self.dx * self.dy / 36 * np.array([
             [4, 2, 1, 2],
             [2, 4, 2, 1],
             [1, 2, 4, 2],
@@ -77,13 +111,25 @@ class FEMPlateModalAnalysis:
         ])
         
         # Stiffness matrix for plate bending
-        factor = self.D * self.dx * self.dy
-        ke = factor * np.array([
+        ke_unit = np.array([
             [4, -1, -2, -1],
             [-1, 4, -1, -2],
             [-2, -1, 4, -1],
             [-1, -2, -1, 4]
-        ]) / (self.dx * self.dy)
+        ], dtype=float)
+        
+        return ke_unit, me_unit
+    
+    def compute_element_matrices(self):
+        """
+        Compute consistent mass and stiffness matrices for all plate elements.
+        
+        Returns:
+            ke, me (ndarray): Batched element matrices of shape (num_elements, 4, 4)
+        """
+        ke_unit, me_unit = self.unit_element_matrices()
+        ke = self.D[:, None, None] * ke_unit
+        me = (self.rho_elem * self.t_elem)[:, None, None] * me_unit
         
         return ke, me
     
@@ -92,44 +138,56 @@ class FEMPlateModalAnalysis:
         dof_per_node = 1  # Transverse displacement only
         total_dof = self.num_nodes * dof_per_node
         
-        # Initialize global matrices
-        K = sp.lil_matrix((total_dof, total_dof))
-        M = sp.lil_matrix((total_dof, total_dof))
-        
         # Get element matrices
         ke, me = self.compute_element_matrices()
         
-        # Assemble matrices
-        for elem in self.elements:
-            for i, ni in enumerate(elem):
-                for j, nj in enumerate(elem):
-                    K[ni, nj] += ke[i, j]
-                    M[ni, nj] += me[i, j]
+        # Scatter all element entries at once; duplicates are summed by COO -> CSC
+        rows = np.repeat(self.elements, 4, axis=1).ravel()
+        cols = np.tile(self.elements, (1, 4)).ravel()
+        K = sp.coo_matrix((ke.ravel(), (rows, cols)), shape=(total_dof, total_dof))
+        M = sp.coo_matrix((me.ravel(), (rows, cols)), shape=(total_dof, total_dof))
         
         return K.tocsc(), M.tocsc()
     
-    def solve_modes(self, num_modes, fixed_edges):
-        """Solve eigenvalue problem for natural frequencies and mode shapes"""
-        self.generate_mesh()
+    def reduced_matrices(self, fixed_edges):
+        """Assemble global matrices and remove the DOFs of the fixed edges"""
         K, M = self.assemble_global_matrices()
         
         # Apply boundary conditions
         fixed_nodes = self.apply_boundary_conditions(fixed_edges)
-        free_dofs = [i for i in range(self.num_nodes) if i not in fixed_nodes]
+        free_dofs = np.setdiff1d(np.arange(self.num_nodes), fixed_nodes)
         
         # Reduce matrices
         K_red = K[free_dofs, :][:, free_dofs]
         M_red = M[free_dofs, :][:, free_dofs]
         
+        return K_red, M_red, free_dofs
+    
+    def solve_modes(self, num_modes, fixed_edges, backend='auto'):
+        """
+        Solve eigenvalue problem for natural frequencies and mode shapes.
+        
+        backend selects an entry of solvers.SOLVER_BACKENDS ('dense',
+        'shift_invert', 'lobpcg'); 'auto' chooses from the problem size.
+        """
+        self.generate_mesh()
+        K_red, M_red, free_dofs = self.reduced_matrices(fixed_edges)
+        return self.solve_reduced(K_red, M_red, free_dofs, num_modes, backend=backend)
+    
+    def solve_reduced(self, K_red, M_red, free_dofs, num_modes, backend='auto', OPinv=None):
+        """
+        Solve the reduced eigenvalue problem and expand modes to all nodes.
+        
+        At most one mode per free DOF is returned. OPinv may supply a
+        prefactorized inverse of K_red (e.g. a cached LU wrapped in a
+        LinearOperator) to skip the shift-invert factorization. The backend
+        actually used is stored in self.solver_backend.
+        """
+        num_modes = min(num_modes, K_red.shape[0])
+        
         # Solve eigenvalue problem
-        eigenvalues, eigenvectors = eigsh(
-            K_red, 
-            k=num_modes, 
-            M=M_red, 
-            sigma=0, 
-            which='LM',
-            tol=1e-6,
-            maxiter=1000
+        eigenvalues, eigenvectors, self.solver_backend = solve_eigenproblem(
+            K_red, M_red, num_modes, backend=backend, OPinv=OPinv
         )
         
         # Process results
@@ -147,4 +205,111 @@ class FEMPlateModalAnalysis:
                 mode /= max_disp
             mode_shapes[free_dofs, i] = mode
         
-        return frequencies, mode_shapes
\ No newline at end of file
+        return frequencies, mode_shapes
+    
+    def frequency_sensitivities(self, frequencies, mode_shapes,
+                                parameters=('E', 'nu', 'rho', 'thickness'),
+                                element_parameters=('thickness', 'rho'), repeated_rtol=1e-5):
+        """
+        Analytic gradients of natural frequencies from already computed modes.
+        
+        Uses d(lambda)/dp = phi^T (dK/dp - lambda dM/dp) phi for mass-normalized
+        modes, evaluated element by element since K and M are linear in the
+        element rigidities and areal masses. No additional solve is needed.
+        
+        The formula only holds for distinct frequencies. Modes whose frequencies
+        agree within repeated_rtol (e.g. symmetric modes of square plates) get the
+        gradient of the group's mean frequency instead, which does not depend on
+        the basis the solver returned; a RuntimeWarning lists such groups.
+        
+        Args:
+            frequencies (ndarray): Natural frequencies from solve_modes (Hz)
+            mode_shapes (ndarray): Mode shapes from solve_modes, any normalization
+            parameters (iterable): Global parameters; the gradient corresponds to
+                changing the property of every element by the same amount
+            element_parameters (iterable): Parameters to differentiate per element
+            repeated_rtol (float): Relative tolerance for treating frequencies as repeated
+            
+        Returns:
+            dict: 'E', 'nu', 'rho', 'thickness' -> df/dp of shape (num_modes,) and
+                'element_<name>' -> df/dp_e of shape (num_elements, num_modes), in Hz
+                per unit of the parameter
+        """
+        names = ('E', 'nu', 'rho', 'thickness')
+        for name in tuple(parameters) + tuple(element_parameters):
+            if name not in names:
+                raise ValueError(f"Unknown sensitivity parameter: {name}")
+        if self.elements is None:
+            self.generate_mesh()
+            
+        frequencies = np.asarray(frequencies, dtype=float)
+        eigenvalues = (2 * np.pi * frequencies)**2
+        ke_unit, me_unit = self.unit_element_matrices()
+        
+        # Element strain and kinetic energies per unit property, (num_elements, num_modes)
+        phi = mode_shapes[self.elements]
+        strain = np.einsum('eim,ij,ejm->em', phi, ke_unit, phi)
+        kinetic = np.einsum('eim,ij,ejm->em', phi, me_unit, phi)
+        
+        # Mass normalization phi^T M phi of the given mode shapes
+        areal_mass = self.rho_elem * self.t_elem
+        modal_mass = areal_mass @ kinetic
+        
+        # Derivatives of element rigidity and areal mass w.r.t. each property
+        D, E, nu, rho, t = self.D, self.E_elem, self.nu_elem, self.rho_elem, self.t_elem
+        dD = {'E': D / E, 'nu': 2 * nu * D / (1 - nu**2), 'rho': 0.0, 'thickness': 3 * D / t}
+        dm = {'E': 0.0, 'nu': 0.0, 'rho': t, 'thickness': rho}
+        
+        # df = dlambda / (8 pi^2 f); rigid-body modes (f = 0) give inf/nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = 1.0 / (modal_mass * 8 * np.pi**2 * frequencies)
+        
+        groups = repeated_frequency_groups(frequencies, repeated_rtol)
+        if groups:
+            warnings.warn(
+                "Repeated frequencies for modes "
+                + ", ".join("/".join(str(i + 1) for i in group) for group in groups)
+                + "; returning sensitivities of their mean frequency",
+                RuntimeWarning, stacklevel=2
+            )
+        
+        sensitivities = {}
+        for name in names:
+            if name not in parameters and name not in element_parameters:
+                continue
+            dD_e = np.broadcast_to(dD[name], D.shape)[:, None]
+            dm_e = np.broadcast_to(dm[name], D.shape)[:, None]
+            element_grad = (dD_e * strain - eigenvalues * dm_e * kinetic) * scale
+            for group in groups:
+                # Trace of the group's sensitivity matrix is basis independent
+                element_grad[:, group] = element_grad[:, group].mean(axis=1, keepdims=True)
+            if name in element_parameters:
+                sensitivities[f'element_{name}'] = element_grad
+            if name in parameters:
+                sensitivities[name] = element_grad.sum(axis=0)
+        
+        return sensitivities
+
+
+def repeated_frequency_groups(frequencies, rtol=1e-5):
+    """Index lists of consecutive sorted frequencies that agree within rtol"""
+    groups = []
+    current = [0]
+    for i in range(1, len(frequencies)):
+        if abs(frequencies[i] - frequencies[i - 1]) <= rtol * abs(frequencies[i]):
+            current.append(i)
+        else:
+            if len(current) > 1:
+                groups.append(current)
+            current = [i]
+    if len(current) > 1:
+        groups.append(current)
+    return groups
+
+
+def element_centroids(length, width, nx, ny):
+    """Return (x, y) centroid coordinates of the elements of an nx x ny mesh in mesh order"""
+    xc = (np.arange(nx) + 0.5) * length / nx
+    yc = (np.arange(ny) + 0.5) * width / ny
+    X, Y = np.meshgrid(xc, yc)
+    return X.ravel(), Y.ravel()
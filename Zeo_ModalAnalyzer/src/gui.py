@@ -8,6 +8,8 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt
 from fem_analysis import FEMPlateModalAnalysis
+import solve_service
+from solvers import SOLVER_BACKENDS
 from visualization import ModeShapeCanvas
 
 class FEMInputPanel(QGroupBox):
@@ -104,6 +106,12 @@ class FEMInputPanel(QGroupBox):
         self.num_modes_input.setValue(5)
         self.layout.addWidget(self.num_modes_input, 6, 1)
         
+        # Eigen-solver backend
+        self.layout.addWidget(QLabel("Solver:"), 6, 2)
+        self.solver_input = QComboBox()
+        self.solver_input.addItems(["auto"] + sorted(SOLVER_BACKENDS))
+        self.layout.addWidget(self.solver_input, 6, 3)
+        
         self.setLayout(self.layout)
         self.bc_edges_list = []
         
@@ -134,7 +142,8 @@ class FEMInputPanel(QGroupBox):
             'rho': self.rho_input.value(),
             'thickness': self.thickness_input.value(),
             'fixed_edges': self.bc_edges_list,
-            'num_modes': self.num_modes_input.value()
+            'num_modes': self.num_modes_input.value(),
+            'backend': self.solver_input.currentText()
         }
     
     def validate_inputs(self):
@@ -186,7 +195,7 @@ class ResultsTable(QTableWidget):
 class MainWindow(QMainWindow):
     """Main application window with status bar and save functionality"""
     
-    def __init__(self):
+    def __init__(self, use_solve_service=False, solve_service_address=None):
         super().__init__()
         self.setWindowTitle("2D Plate Modal Analyzer")
         self.setGeometry(100, 100, 1400, 800)
@@ -297,6 +306,11 @@ class MainWindow(QMainWindow):
         self.mode_shapes = None
         self.frequencies = None
         
+        # Optional persistent solve service backend
+        self.solve_client = None
+        if use_solve_service:
+            self.solve_client = solve_service.connect(solve_service_address)
+        
     def run_analysis(self):
         """Run FEM analysis and display results"""
         # Validate inputs
@@ -323,10 +337,7 @@ class MainWindow(QMainWindow):
                 thickness=params['thickness']
             )
             
-            self.frequencies, self.mode_shapes = fem.solve_modes(
-                num_modes=params['num_modes'],
-                fixed_edges=params['fixed_edges']
-            )
+            self.frequencies, self.mode_shapes = self.solve(fem, params)
             
             # Store results
             self.nodes = fem.nodes
@@ -348,6 +359,29 @@ class MainWindow(QMainWindow):
             QMessageBox.critical(self, "Analysis Error", f"Error during analysis:\n{str(e)}")
             self.status_bar.showMessage("Analysis failed")
             
+    def solve(self, fem, params):
+        """Solve locally, or through the solve service when one is connected"""
+        if self.solve_client is not None:
+            try:
+                result = self.solve_client.solve_modes(
+                    num_modes=params['num_modes'],
+                    fixed_edges=params['fixed_edges'],
+                    backend=params['backend'],
+                    **{name: params[name] for name in solve_service.MODEL_PARAMETERS}
+                )
+                fem.generate_mesh()
+                return result
+            except (OSError, EOFError):
+                # Service went away; keep working with the local solver
+                self.solve_client = None
+                self.status_bar.showMessage("Solve service unavailable, solving locally...")
+                
+        return fem.solve_modes(
+            num_modes=params['num_modes'],
+            fixed_edges=params['fixed_edges'],
+            backend=params['backend']
+        )
+            
     def display_mode_shape(self, index):
         """Display selected mode shape"""
         if self.mode_shapes is not None and 0 <= index < self.mode_shapes.shape[1]:
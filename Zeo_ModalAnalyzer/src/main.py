@@ -1,9 +1,16 @@
 import sys
+import argparse
 from PyQt5.QtWidgets import QApplication
 from gui import MainWindow
+from solve_service import parse_address
 
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="2D Plate Modal Analyzer")
+    parser.add_argument('--service', nargs='?', const='', default=None, metavar='ADDRESS',
+                        help="Use a running solve service (default address if none given)")
+    args, qt_args = parser.parse_known_args()
+    
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setStyle("Fusion")
     
     # Set application stylesheet
@@ -38,7 +45,10 @@ def main():
         }
     """)
     
-    window = MainWindow()
+    window = MainWindow(
+        use_solve_service=args.service is not None,
+        solve_service_address=parse_address(args.service)
+    )
     window.show()
     sys.exit(app.exec_())
 
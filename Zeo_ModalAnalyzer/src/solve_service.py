@@ -0,0 +1,675 @@
+"""
+Persistent local solve service for plate modal analysis.
+
+A long-running daemon keeps warm worker processes with in-memory LRU caches
+of meshed models, reduced matrices, factorizations and results. Clients send
+batched solve requests over a Unix socket (localhost TCP on Windows) and
+receive mode shapes through client-owned shared memory blocks, so the mode
+shape arrays are written once by the worker and never pickled.
+
+The socket lives in a per-user 0700 runtime directory and every connection is
+authenticated with a random key generated at startup. The key and the actual
+address are written to a 0600 service file that clients read.
+
+Start the daemon with:
+    python src/solve_service.py
+
+Callable property fields are evaluated on the element centroids by the
+client, so only scalars and per-element arrays are sent to the workers.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError, connection, shared_memory
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+MODEL_PARAMETERS = ('length', 'width', 'nx', 'ny', 'E', 'nu', 'rho', 'thickness')
+FIELD_PARAMETERS = ('E', 'nu', 'rho', 'thickness')
+
+DEFAULT_CACHE_BYTES = 256 * 1024**2
+
+# Workers are (re)started from a multi-threaded process, where fork is unsafe
+_mp = multiprocessing.get_context('spawn')
+
+
+def runtime_dir():
+    """Per-user directory for the socket and service file, created with mode 0700"""
+    base = os.environ.get('XDG_RUNTIME_DIR')
+    if base:
+        path = os.path.join(base, 'zeo_modal_analyzer')
+    else:
+        path = os.path.join(os.path.expanduser('~'), '.zeo_modal_analyzer')
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if sys.platform != 'win32':
+        st = os.stat(path)
+        if st.st_uid != os.getuid():
+            raise PermissionError(f"{path} is not owned by the current user")
+        if st.st_mode & 0o077:
+            os.chmod(path, 0o700)
+    return path
+
+
+def default_address():
+    """Socket path in the runtime directory, or a free localhost port on Windows"""
+    if sys.platform == 'win32':
+        return ('localhost', 0)
+    return os.path.join(runtime_dir(), 'solver.sock')
+
+
+def default_service_file():
+    return os.path.join(runtime_dir(), 'service.json')
+
+
+def write_service_file(path, address, authkey):
+    """Atomically write the service address and key to a file readable only by the owner"""
+    tmp = path + '.tmp'
+    try:
+        os.unlink(tmp)
+    except FileNotFoundError:
+        pass
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'address': address, 'authkey': authkey.hex()}, f)
+    os.replace(tmp, path)
+
+
+def read_service_file(path=None):
+    """Return (address, authkey) of the running service"""
+    with open(path or default_service_file()) as f:
+        info = json.load(f)
+    address = info['address']
+    if isinstance(address, list):
+        address = tuple(address)
+    return address, bytes.fromhex(info['authkey'])
+
+
+def model_key(params):
+    """Hashable cache key for a set of FEMPlateModalAnalysis constructor arguments"""
+    key = []
+    for name in MODEL_PARAMETERS:
+        value = np.asarray(params[name], dtype=float)
+        if value.ndim == 0:
+            key.append(float(value))
+        else:
+            key.append(hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest())
+    return tuple(key)
+
+
+def job_request(job):
+    """
+    Build the request sent to the service for one solve job.
+
+    Callable property fields are evaluated on the element centroids here,
+    since callables generally cannot be pickled. Raises KeyError if the job
+    is missing a parameter.
+    """
+    params = {name: job[name] for name in MODEL_PARAMETERS}
+    for name in FIELD_PARAMETERS:
+        if callable(params[name]):
+            from fem_analysis import element_centroids
+            centroids = element_centroids(params['length'], params['width'],
+                                          params['nx'], params['ny'])
+            params[name] = np.asarray(params[name](*centroids), dtype=float)
+    return {
+        'params': params,
+        'num_modes': job['num_modes'],
+        'fixed_edges': list(job['fixed_edges']),
+        'backend': job.get('backend', 'auto'),
+    }
+
+
+def _attach_shared_memory(name):
+    """Attach to a client-owned shared memory block without taking ownership"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers attached blocks with the resource tracker,
+        # which would unlink the client's block when the worker exits. Workers
+        # are single threaded, so registration is skipped for this call only.
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _nbytes(obj):
+    """Approximate memory held by cached arrays, sparse matrices, factors and models"""
+    if obj is None or isinstance(obj, (int, float, str)):
+        return 0
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (tuple, list)):
+        return sum(_nbytes(item) for item in obj)
+    if hasattr(obj, 'perm_c'):
+        # SuperLU factor: values and row indices of L and U
+        return 12 * obj.nnz
+    if hasattr(obj, 'indptr'):
+        return obj.data.nbytes + obj.indices.nbytes + obj.indptr.nbytes
+    if hasattr(obj, '__dict__'):
+        return sum(_nbytes(value) for value in vars(obj).values())
+    return 0
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by the total size of its values in bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self._data:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key][0]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Store value unless it alone exceeds the budget, evicting the oldest entries"""
+        self.discard(key)
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+        self._data[key] = (value, size)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            _, (_, evicted) = self._data.popitem(last=False)
+            self.nbytes -= evicted
+
+    def discard(self, key):
+        if key in self._data:
+            self.nbytes -= self._data.pop(key)[1]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SolveWorker:
+    """Solver state living inside one warm worker process"""
+
+    def __init__(self, cache_bytes=DEFAULT_CACHE_BYTES):
+        from fem_analysis import FEMPlateModalAnalysis
+        from scipy.sparse.linalg import LinearOperator, splu
+        from solvers import check_memory, select_backend
+        self._model_cls = FEMPlateModalAnalysis
+        self._select_backend = select_backend
+        self._check_memory = check_memory
+        self._LinearOperator = LinearOperator
+        self._splu = splu
+        # One byte budget shared by models, reduced matrices/factors and results
+        self.cache = LRUCache(cache_bytes)
+
+    def model(self, mkey, params):
+        fem = self.cache.get(('model', mkey))
+        if fem is None:
+            fem = self._model_cls(**{name: params[name] for name in MODEL_PARAMETERS})
+            fem.generate_mesh()
+            self.cache.put(('model', mkey), fem)
+        return fem
+
+    def solve(self, request):
+        """Solve one request, writing mode shapes into its shared memory block"""
+        params = request['params']
+        num_modes = request['num_modes']
+        edges = tuple(sorted(request['fixed_edges']))
+        backend = request.get('backend', 'auto')
+        mkey = model_key(params)
+
+        result = self.cache.get(('result', mkey, edges, num_modes, backend))
+        if result is None:
+            fem = self.model(mkey, params)
+            reduced = self.cache.get(('reduced', mkey, edges))
+            if reduced is None:
+                reduced = fem.reduced_matrices(edges) + (None,)
+            K_red, M_red, free_dofs, lu = reduced
+            solver = backend
+            if solver == 'auto':
+                solver = self._select_backend(K_red.shape[0], min(num_modes, K_red.shape[0]))
+            if solver == 'shift_invert' and lu is None:
+                if backend != 'auto':
+                    self._check_memory(solver, K_red.shape[0], num_modes)
+                # Factorize once and reuse for every mode count on this model
+                lu = self._splu(K_red.tocsc())
+            self.cache.put(('reduced', mkey, edges), (K_red, M_red, free_dofs, lu))
+            OPinv = None
+            if lu is not None and solver == 'shift_invert':
+                OPinv = self._LinearOperator(K_red.shape, matvec=lu.solve, dtype=K_red.dtype)
+            result = fem.solve_reduced(K_red, M_red, free_dofs, num_modes,
+                                       backend=solver, OPinv=OPinv)
+            self.cache.put(('result', mkey, edges, num_modes, backend), result)
+
+        frequencies, mode_shapes = result
+        shm = _attach_shared_memory(request['shm'])
+        try:
+            out = np.ndarray(mode_shapes.shape, dtype=np.float64, buffer=shm.buf)
+            out[:] = mode_shapes
+            del out
+        finally:
+            shm.close()
+        return frequencies
+
+    def stats(self):
+        return {'entries': len(self.cache), 'bytes': self.cache.nbytes,
+                'max_bytes': self.cache.max_bytes, 'hits': self.cache.hits,
+                'misses': self.cache.misses}
+
+
+def _worker_main(tasks, results, cache_bytes):
+    """
+    Worker process loop: pull (job_id, op, payload) tasks until a None sentinel.
+
+    Replies go through the worker's own pipe so that a worker dying mid-write
+    cannot corrupt the channel of the others.
+    """
+    worker = SolveWorker(cache_bytes)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        job_id, op, payload = task
+        try:
+            if op == 'solve':
+                results.send((job_id, True, worker.solve(payload)))
+            elif op == 'stats':
+                results.send((job_id, True, worker.stats()))
+            else:
+                raise ValueError(f"Unknown worker operation: {op}")
+        except Exception as e:
+            results.send((job_id, False, f"{type(e).__name__}: {e}"))
+
+
+class SolveService:
+    """
+    Local solve daemon dispatching requests to a pool of warm workers.
+
+    Requests for the same model and boundary conditions are always routed to
+    the same worker so that its caches are reused. Workers that die (e.g.
+    killed for running out of memory) fail their pending requests and are
+    restarted.
+
+    Attributes:
+        address (str or tuple): Unix socket path or (host, port)
+        num_workers (int): Number of worker processes
+        cache_bytes (int): Cache budget of each worker in bytes
+        service_file (str): File receiving the address and authentication key
+    """
+
+    def __init__(self, address=None, num_workers=None, cache_bytes=DEFAULT_CACHE_BYTES,
+                 authkey=None, service_file=None):
+        self.address = address
+        self.num_workers = num_workers or max(1, min(4, os.cpu_count() or 1))
+        self.cache_bytes = cache_bytes
+        self.authkey = authkey
+        self.service_file = service_file
+        self._listener = None
+        self._workers = []
+        self._tasks = []
+        self._results = []
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._serving = False
+        self._stopping = threading.Event()
+        self._stopped = threading.Event()
+        self._shutdown_lock = threading.Lock()
+
+    def start(self):
+        """Start worker processes, bind the listening socket and publish the service file"""
+        self.address = self.address or default_address()
+        self.authkey = self.authkey or os.urandom(32)
+        self.service_file = self.service_file or default_service_file()
+
+        for _ in range(self.num_workers):
+            worker, tasks, results = self._spawn_worker()
+            self._workers.append(worker)
+            self._tasks.append(tasks)
+            self._results.append(results)
+        threading.Thread(target=self._supervise, daemon=True).start()
+
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            if ping(self.address, service_file=self.service_file):
+                raise RuntimeError(f"A solve service is already running at {self.address}")
+            os.unlink(self.address)
+        self._listener = Listener(self.address, authkey=self.authkey)
+        self.address = self._listener.address
+        write_service_file(self.service_file, self.address, self.authkey)
+
+    def serve_forever(self):
+        """Accept client connections until shutdown() is called"""
+        if self._listener is None:
+            self.start()
+        self._serving = True
+        while not self._stopping.is_set():
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                # Failed handshakes must not take the daemon down
+                continue
+            if self._stopping.is_set():
+                conn.close()
+                break
+            threading.Thread(target=self._handle_connection, args=(conn,), daemon=True).start()
+        self._serving = False
+
+    def shutdown(self):
+        """Stop accepting connections and terminate the workers"""
+        with self._shutdown_lock:
+            if self._stopping.is_set():
+                first = False
+            else:
+                self._stopping.set()
+                first = True
+        if not first:
+            self._stopped.wait()
+            return
+
+        # Closing the listener does not interrupt a blocked accept(); connect to it instead
+        if self._serving:
+            try:
+                Client(self.address, authkey=self.authkey).close()
+            except (OSError, EOFError, AuthenticationError):
+                pass
+
+        with self._lock:
+            for tasks in self._tasks:
+                tasks.put(None)
+            workers = list(self._workers)
+            pending, self._pending = self._pending, {}
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        for _, future in pending.values():
+            future.set_exception(RuntimeError("Solve service is shutting down"))
+        if self._listener is not None:
+            self._listener.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        try:
+            if read_service_file(self.service_file)[1] == self.authkey:
+                os.unlink(self.service_file)
+        except (OSError, ValueError, KeyError):
+            pass
+        self._stopped.set()
+
+    def _spawn_worker(self):
+        tasks = _mp.Queue()
+        results, worker_end = _mp.Pipe(duplex=False)
+        worker = _mp.Process(target=_worker_main, args=(tasks, worker_end, self.cache_bytes),
+                             daemon=True)
+        worker.start()
+        worker_end.close()
+        return worker, tasks, results
+
+    def _supervise(self):
+        """Deliver worker replies; fail the requests of dead workers and restart them"""
+        while not self._stopping.is_set():
+            with self._lock:
+                readers = {conn: i for i, conn in enumerate(self._results)}
+                sentinels = {worker.sentinel: i for i, worker in enumerate(self._workers)}
+            ready = connection.wait(list(readers) + list(sentinels), timeout=1.0)
+            if self._stopping.is_set():
+                break
+            # Replies first, so results sent just before a worker died are kept
+            for conn in [r for r in ready if r in readers]:
+                try:
+                    job_id, ok, payload = conn.recv()
+                except (EOFError, OSError):
+                    continue
+                self._resolve(job_id, ok, payload)
+            for sentinel in [r for r in ready if r in sentinels]:
+                self._restart_worker(sentinels[sentinel])
+
+    def _restart_worker(self, index):
+        with self._lock:
+            old = self._workers[index]
+            old.join(timeout=1)
+            self._results[index].close()
+            failed = [job_id for job_id, (worker_index, _) in self._pending.items()
+                      if worker_index == index]
+            futures = [self._pending.pop(job_id)[1] for job_id in failed]
+            self._workers[index], self._tasks[index], self._results[index] = self._spawn_worker()
+        for future in futures:
+            future.set_exception(RuntimeError(
+                f"Worker process exited unexpectedly (exit code {old.exitcode})"))
+
+    def _resolve(self, job_id, ok, payload):
+        with self._lock:
+            entry = self._pending.pop(job_id, None)
+        if entry is None:
+            return
+        future = entry[1]
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(payload))
+
+    def _submit(self, worker_index, op, payload):
+        future = Future()
+        job_id = next(self._job_ids)
+        with self._lock:
+            if self._stopping.is_set():
+                raise RuntimeError("Solve service is shutting down")
+            self._pending[job_id] = (worker_index, future)
+            self._tasks[worker_index].put((job_id, op, payload))
+        return future
+
+    def _route(self, request):
+        key = (model_key(request['params']), tuple(sorted(request['fixed_edges'])))
+        return hash(key) % self.num_workers
+
+    def _handle_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    break
+                op = message.get('op')
+                if op == 'ping':
+                    conn.send({'ok': True})
+                elif op == 'solve':
+                    futures = []
+                    for request in message['requests']:
+                        try:
+                            futures.append(self._submit(self._route(request), 'solve', request))
+                        except Exception as e:
+                            futures.append(e)
+                    replies = []
+                    for future in futures:
+                        try:
+                            if isinstance(future, Exception):
+                                raise future
+                            replies.append({'frequencies': future.result()})
+                        except Exception as e:
+                            replies.append({'error': str(e)})
+                    conn.send({'ok': True, 'results': replies})
+                elif op == 'stats':
+                    try:
+                        futures = [self._submit(i, 'stats', None) for i in range(self.num_workers)]
+                        conn.send({'ok': True, 'workers': [f.result() for f in futures]})
+                    except Exception as e:
+                        conn.send({'ok': False, 'error': str(e)})
+                elif op == 'shutdown':
+                    conn.send({'ok': True})
+                    threading.Thread(target=self.shutdown, daemon=True).start()
+                    break
+                else:
+                    conn.send({'ok': False, 'error': f"Unknown operation: {op}"})
+
+
+class SolveServiceClient:
+    """
+    Client for a running SolveService.
+
+    The address and authentication key default to the ones published in the
+    service file. Mode shape arrays returned by solve_modes() and solve_batch()
+    are views on shared memory owned by this client. Blocks whose arrays are
+    no longer referenced are freed by release(), which also runs before each
+    solve.
+    """
+
+    def __init__(self, address=None, authkey=None, service_file=None):
+        if address is None or authkey is None:
+            file_address, file_authkey = read_service_file(service_file)
+            address = address or file_address
+            authkey = authkey or file_authkey
+        self.address = address
+        self._conn = Client(address, authkey=authkey)
+        self._segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _call(self, message):
+        self._conn.send(message)
+        reply = self._conn.recv()
+        if not reply.get('ok'):
+            raise RuntimeError(reply.get('error', 'Solve service error'))
+        return reply
+
+    def ping(self):
+        return self._call({'op': 'ping'})['ok']
+
+    def stats(self):
+        """Cache statistics of every worker"""
+        return self._call({'op': 'stats'})['workers']
+
+    def shutdown(self):
+        """Ask the service to stop"""
+        self._call({'op': 'shutdown'})
+
+    def solve_modes(self, num_modes, fixed_edges, backend='auto', **params):
+        """Solve one model; keyword arguments are the FEMPlateModalAnalysis parameters"""
+        job = dict(params, num_modes=num_modes, fixed_edges=fixed_edges, backend=backend)
+        result = self.solve_batch([job])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def solve_batch(self, jobs):
+        """
+        Solve several models in one round trip.
+
+        Args:
+            jobs (list of dict): Model parameters plus 'num_modes', 'fixed_edges'
+                and optionally 'backend'; property fields may be callables
+
+        Returns:
+            list: (frequencies, mode_shapes) per job, or a RuntimeError for failed jobs
+        """
+        self.release()
+        # Build every request first so a malformed job fails before any block is allocated
+        requests = [job_request(job) for job in jobs]
+        outputs, created = [], []
+        try:
+            for request in requests:
+                params = request['params']
+                num_nodes = (params['nx'] + 1) * (params['ny'] + 1)
+                # Upper bound; fewer modes come back when there are fewer free DOFs
+                shm = shared_memory.SharedMemory(create=True,
+                                                 size=8 * num_nodes * request['num_modes'])
+                created.append(shm)
+                outputs.append((num_nodes, shm))
+                request['shm'] = shm.name
+            replies = self._call({'op': 'solve', 'requests': requests})['results']
+        finally:
+            # The mapping stays valid after unlink on POSIX
+            for shm in created:
+                shm.unlink()
+            self._segments.extend(created)
+
+        results = []
+        for reply, (num_nodes, shm) in zip(replies, outputs):
+            if 'error' in reply:
+                results.append(RuntimeError(reply['error']))
+            else:
+                shape = (num_nodes, len(reply['frequencies']))
+                mode_shapes = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+                results.append((reply['frequencies'], mode_shapes))
+        return results
+
+    def release(self):
+        """Free shared memory blocks whose mode shape arrays are no longer referenced"""
+        alive = []
+        for shm in self._segments:
+            try:
+                shm.close()
+            except BufferError:
+                alive.append(shm)
+        self._segments = alive
+
+    def close(self):
+        self.release()
+        self._conn.close()
+
+
+def ping(address=None, authkey=None, service_file=None):
+    """Return True if a solve service answers at address"""
+    try:
+        with SolveServiceClient(address, authkey, service_file) as client:
+            return client.ping()
+    except (OSError, EOFError, ValueError, KeyError, AuthenticationError):
+        return False
+
+
+def connect(address=None, authkey=None, service_file=None):
+    """Return a client for a running service, or None if none is reachable"""
+    try:
+        return SolveServiceClient(address, authkey, service_file)
+    except (OSError, EOFError, ValueError, KeyError, AuthenticationError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent plate modal analysis solve service")
+    parser.add_argument('--address', default=None,
+                        help="Unix socket path, or host:port for localhost TCP")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes")
+    parser.add_argument('--cache-mb', type=float, default=DEFAULT_CACHE_BYTES / 1024**2,
+                        help="Cache budget per worker in megabytes")
+    args = parser.parse_args()
+
+    service = SolveService(parse_address(args.address), args.workers,
+                           int(args.cache_mb * 1024**2))
+    service.start()
+    print(f"Solve service listening on {service.address} with {service.num_workers} workers")
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+
+
+def parse_address(text):
+    """Parse a command line address: None for the default, host:port or a socket path"""
+    if not text:
+        return None
+    host, sep, port = text.rpartition(':')
+    if sep and port.isdigit():
+        return (host or 'localhost', int(port))
+    return text
+
+
+if __name__ == "__main__":
+    main()
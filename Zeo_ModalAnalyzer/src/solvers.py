@@ -0,0 +1,354 @@
+"""
+Eigen-solver backends for the reduced plate eigenvalue problem K x = lambda M x.
+
+Backends are registered by name in SOLVER_BACKENDS and share the signature
+solver(K, M, num_modes, OPinv=None) -> (eigenvalues, eigenvectors). The 'auto'
+choice picks one from the number of free DOFs, the requested modes and the
+available memory, using thresholds that can be recalibrated on the local
+machine with:
+    python src/solvers.py --calibrate
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import scipy.linalg
+import pyamg
+from scipy.sparse.linalg import eigsh, lobpcg, splu
+
+SOLVER_BACKENDS = {}
+
+# Crossover where shift-invert overtakes a dense subset solve, a model of
+# sparse LU fill-in (nonzeros per DOF per squared log2 of the DOF count), the
+# peak bytes per DOF of building the multigrid preconditioner, and the number
+# of n-by-num_modes blocks LOBPCG keeps alive; calibrate() measures them all
+DEFAULT_THRESHOLDS = {
+    'dense_max_dofs': 250,
+    'lu_fill_per_dof_log2': 0.6,
+    'amg_bytes_per_dof': 700,
+    'lobpcg_blocks': 21,
+    'memory_fraction': 0.5,
+}
+
+# Largest relative residual |K x - lambda M x| / |K x| accepted from LOBPCG
+LOBPCG_RESIDUAL_TOL = 1e-5
+
+THRESHOLDS_FILE = os.path.join(os.path.expanduser('~'), '.zeo_modal_analyzer',
+                               'solver_thresholds.json')
+
+_thresholds = None
+
+
+def register_backend(name):
+    """Decorator registering solver(K, M, num_modes, OPinv=None) under name"""
+    def decorator(solver):
+        SOLVER_BACKENDS[name] = solver
+        return solver
+    return decorator
+
+
+@register_backend('dense')
+def dense_subset(K, M, num_modes, OPinv=None):
+    """LAPACK generalized symmetric solve for the lowest num_modes eigenpairs"""
+    K = K.toarray() if hasattr(K, 'toarray') else K
+    M = M.toarray() if hasattr(M, 'toarray') else M
+    return scipy.linalg.eigh(K, M, subset_by_index=[0, num_modes - 1])
+
+
+@register_backend('shift_invert')
+def sparse_shift_invert(K, M, num_modes, OPinv=None):
+    """ARPACK Lanczos in shift-invert mode around zero"""
+    return eigsh(
+        K,
+        k=num_modes,
+        M=M,
+        sigma=0,
+        which='LM',
+        tol=1e-6,
+        maxiter=1000,
+        OPinv=OPinv
+    )
+
+
+@register_backend('lobpcg')
+def iterative_lobpcg(K, M, num_modes, OPinv=None):
+    """
+    Preconditioned LOBPCG without a full factorization.
+
+    The preconditioner is OPinv when supplied, otherwise smoothed aggregation
+    multigrid. Raises RuntimeError if the eigenpairs do not converge.
+    """
+    n = K.shape[0]
+    if OPinv is None:
+        OPinv = lobpcg_preconditioner(K)
+    X = np.random.default_rng(0).standard_normal((n, num_modes))
+    with warnings.catch_warnings():
+        # Convergence is checked on the residuals below
+        warnings.simplefilter('ignore', UserWarning)
+        eigenvalues, eigenvectors = lobpcg(K, X, B=M, M=OPinv, largest=False, maxiter=500)
+
+    KX = K @ eigenvectors
+    residuals = np.linalg.norm(KX - (M @ eigenvectors) * eigenvalues, axis=0)
+    residuals /= np.linalg.norm(KX, axis=0)
+    if not np.all(residuals <= LOBPCG_RESIDUAL_TOL):
+        raise RuntimeError(
+            f"LOBPCG did not converge: largest relative residual {np.max(residuals):.1e} "
+            f"exceeds {LOBPCG_RESIDUAL_TOL:.0e}; use the 'shift_invert' backend"
+        )
+    return eigenvalues, eigenvectors
+
+
+def lobpcg_preconditioner(K):
+    """Smoothed aggregation multigrid preconditioner for K"""
+    return pyamg.smoothed_aggregation_solver(K.tocsr()).aspreconditioner()
+
+
+def available_memory():
+    """Available physical memory in bytes, or None if it cannot be determined"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def load_thresholds():
+    """Default thresholds updated with a local calibration file if one exists"""
+    global _thresholds
+    if _thresholds is None:
+        _thresholds = dict(DEFAULT_THRESHOLDS)
+        try:
+            with open(THRESHOLDS_FILE) as f:
+                _thresholds.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+    return _thresholds
+
+
+def estimate_memory(backend, num_dofs, num_modes, thresholds=None):
+    """
+    Rough peak memory in bytes of a backend for the given problem size, or
+    None for a registered backend without a memory model
+    """
+    thresholds = thresholds or load_thresholds()
+    n = num_dofs
+    if backend == 'dense':
+        # Dense K, M and LAPACK workspace
+        return 3 * 8 * n**2
+    if backend == 'shift_invert':
+        lu_nnz = thresholds['lu_fill_per_dof_log2'] * n * max(np.log2(n), 1.0)**2
+        return 12 * lu_nnz + 8 * n * (2 * num_modes + 20)
+    if backend != 'lobpcg':
+        return None
+    # Block vectors of LOBPCG plus its multigrid hierarchy
+    return 8 * n * num_modes * thresholds['lobpcg_blocks'] + thresholds['amg_bytes_per_dof'] * n
+
+
+def memory_budget(memory=None, thresholds=None):
+    """Bytes a solve may use: a fraction of memory, by default the available memory"""
+    thresholds = thresholds or load_thresholds()
+    if memory is None:
+        memory = available_memory()
+    return np.inf if memory is None else thresholds['memory_fraction'] * memory
+
+
+def select_backend(num_dofs, num_modes, memory=None, thresholds=None):
+    """
+    Pick a backend name for a problem with num_dofs free DOFs.
+
+    Dense is preferred for small problems and is the only choice when ARPACK
+    cannot return the requested number of modes; shift-invert is preferred for
+    larger problems while its factor fits in memory, and LOBPCG is the
+    fallback for very large meshes. Raises MemoryError if no suitable backend
+    fits in the memory budget.
+    """
+    thresholds = thresholds or load_thresholds()
+    budget = memory_budget(memory, thresholds)
+
+    # ARPACK requires num_modes < num_dofs - 1; LOBPCG needs several times more DOFs than modes
+    if num_modes >= num_dofs - 1:
+        candidates = ['dense']
+    elif num_dofs <= thresholds['dense_max_dofs']:
+        candidates = ['dense', 'shift_invert', 'lobpcg']
+    else:
+        candidates = ['shift_invert', 'lobpcg']
+    if num_dofs < 5 * num_modes and 'lobpcg' in candidates:
+        candidates.remove('lobpcg')
+        if 'dense' not in candidates:
+            candidates.append('dense')
+
+    for backend in candidates:
+        if estimate_memory(backend, num_dofs, num_modes, thresholds) <= budget:
+            return backend
+    needed = min(estimate_memory(b, num_dofs, num_modes, thresholds) for b in candidates)
+    raise MemoryError(
+        f"{num_modes} modes of a {num_dofs}-DOF problem need about {needed / 1024**3:.1f} GB "
+        f"(backends considered: {', '.join(candidates)}), but only {budget / 1024**3:.1f} GB "
+        f"is available; request fewer modes or use a coarser mesh"
+    )
+
+
+def solve_eigenproblem(K, M, num_modes, backend='auto', OPinv=None):
+    """
+    Solve K x = lambda M x for the lowest num_modes eigenpairs.
+
+    Args:
+        backend (str): Name in SOLVER_BACKENDS, or 'auto' to use select_backend
+        OPinv (LinearOperator): Optional prefactorized inverse of K
+
+    Returns:
+        eigenvalues, eigenvectors, name of the backend used
+
+    Raises:
+        MemoryError: If the backend is not expected to fit in the memory budget
+    """
+    if backend == 'auto':
+        backend = select_backend(K.shape[0], num_modes)
+    elif backend not in SOLVER_BACKENDS:
+        raise ValueError(f"Unknown solver backend '{backend}', "
+                         f"available: {', '.join(sorted(SOLVER_BACKENDS))}")
+    elif OPinv is None:
+        # A supplied OPinv has already been allocated, so only fresh solves are checked
+        check_memory(backend, K.shape[0], num_modes)
+    eigenvalues, eigenvectors = SOLVER_BACKENDS[backend](K, M, num_modes, OPinv=OPinv)
+    return eigenvalues, eigenvectors, backend
+
+
+def check_memory(backend, num_dofs, num_modes, memory=None, thresholds=None):
+    """Raise MemoryError if backend is not expected to fit in the memory budget"""
+    needed = estimate_memory(backend, num_dofs, num_modes, thresholds)
+    budget = memory_budget(memory, thresholds)
+    if needed is not None and needed > budget:
+        raise MemoryError(
+            f"The '{backend}' backend needs about {needed / 1024**3:.1f} GB for {num_modes} "
+            f"modes of a {num_dofs}-DOF problem, but only {budget / 1024**3:.1f} GB is "
+            f"available; use backend='auto', request fewer modes or use a coarser mesh"
+        )
+
+
+def clamped_plate(n):
+    """Reduced K and M of an n x n steel plate clamped on all edges, for benchmarks"""
+    from fem_analysis import FEMPlateModalAnalysis
+
+    fem = FEMPlateModalAnalysis(1.0, 1.0, n, n, 2.1e11, 0.3, 7850, 0.01)
+    fem.generate_mesh()
+    K_red, M_red, _ = fem.reduced_matrices(['left', 'right', 'top', 'bottom'])
+    return K_red, M_red
+
+
+def dense_crossover(dense_faster):
+    """
+    Largest DOF count up to which dense is preferred.
+
+    Args:
+        dense_faster (list): (num_dofs, dense was faster) pairs in increasing size
+
+    A single size where shift-invert wins is treated as timing noise; the
+    crossover is placed before the first of two consecutive shift-invert wins
+    (or a shift-invert win at the largest size).
+    """
+    dense_max_dofs = 0
+    for i, (num_dofs, faster) in enumerate(dense_faster):
+        if not faster and (i + 1 == len(dense_faster) or not dense_faster[i + 1][1]):
+            break
+        dense_max_dofs = num_dofs
+    return dense_max_dofs
+
+
+def calibrate(sizes=(4, 8, 12, 14, 16, 18, 20, 24, 32, 48), memory_sizes=(32, 64, 128, 256),
+              num_modes=6, repeats=3):
+    """
+    Benchmark the backends on clamped square plates.
+
+    Times dense against shift-invert on the meshes in sizes to find their
+    crossover, and measures the LU fill-in, the multigrid setup memory and the
+    LOBPCG working set on the larger meshes in memory_sizes. Memory constants
+    are the largest seen over the sizes, so estimates err on the high side.
+
+    Returns:
+        dict: Thresholds for save_thresholds()
+    """
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    dense_faster = []
+    for n in sizes:
+        K_red, M_red = clamped_plate(n)
+        num_dofs = K_red.shape[0]
+        if num_dofs <= num_modes + 1:
+            continue
+        timings = {}
+        for backend in ('dense', 'shift_invert'):
+            best = np.inf
+            for _ in range(repeats):
+                start = time.perf_counter()
+                SOLVER_BACKENDS[backend](K_red, M_red, num_modes)
+                best = min(best, time.perf_counter() - start)
+            timings[backend] = best
+        print(f"{num_dofs:8d} DOFs: dense {timings['dense'] * 1e3:8.2f} ms, "
+              f"shift-invert {timings['shift_invert'] * 1e3:8.2f} ms")
+        dense_faster.append((num_dofs, timings['dense'] <= timings['shift_invert']))
+    thresholds['dense_max_dofs'] = dense_crossover(dense_faster)
+
+    lu_fill, amg_bytes, lobpcg_blocks = [], [], []
+    for n in memory_sizes:
+        K_red, M_red = clamped_plate(n)
+        num_dofs = K_red.shape[0]
+        lu = splu(K_red.tocsc())
+        lu_fill.append((lu.L.nnz + lu.U.nnz) / (num_dofs * np.log2(num_dofs)**2))
+        del lu
+        # SuperLU allocates outside Python, but the multigrid setup and LOBPCG are traceable
+        tracemalloc.start()
+        try:
+            OPinv = lobpcg_preconditioner(K_red)
+            held, peak = tracemalloc.get_traced_memory()
+            amg_bytes.append(peak / num_dofs)
+            tracemalloc.reset_peak()
+            iterative_lobpcg(K_red, M_red, num_modes, OPinv=OPinv)
+            peak = tracemalloc.get_traced_memory()[1]
+            lobpcg_blocks.append((peak - held) / (8 * num_dofs * num_modes))
+        finally:
+            tracemalloc.stop()
+        print(f"{num_dofs:8d} DOFs: LU fill {lu_fill[-1]:5.3f} nnz/(n log2(n)^2), "
+              f"multigrid {amg_bytes[-1]:6.0f} B/DOF, LOBPCG {lobpcg_blocks[-1]:5.1f} blocks")
+    if memory_sizes:
+        thresholds['lu_fill_per_dof_log2'] = round(float(max(lu_fill)), 3)
+        thresholds['amg_bytes_per_dof'] = int(np.ceil(max(amg_bytes)))
+        thresholds['lobpcg_blocks'] = int(np.ceil(max(lobpcg_blocks)))
+    return thresholds
+
+
+def save_thresholds(thresholds, path=THRESHOLDS_FILE):
+    """Write calibrated thresholds so load_thresholds() picks them up"""
+    global _thresholds
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(thresholds, f, indent=2)
+    _thresholds = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plate modal analysis solver backends")
+    parser.add_argument('--calibrate', action='store_true',
+                        help="Benchmark backends and save the selection thresholds")
+    args = parser.parse_args()
+
+    if args.calibrate:
+        thresholds = calibrate()
+        save_thresholds(thresholds)
+        print(f"Saved thresholds to {THRESHOLDS_FILE}: {thresholds}")
+    else:
+        print(f"Backends: {', '.join(sorted(SOLVER_BACKENDS))}")
+        print(f"Thresholds: {load_thresholds()}")
+
+
+if __name__ == "__main__":
+    main()
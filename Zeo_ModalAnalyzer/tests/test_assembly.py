@@ -0,0 +1,84 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import scipy.sparse as sp
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from fem_analysis import FEMPlateModalAnalysis
+
+
+def loop_assembly(fem):
+    """Reference per-entry LIL assembly of uniform element matrices"""
+    me = fem.rho * fem.thickness * fem.dx * fem.dy / 36 * np.array([
+        [4, 2, 1, 2],
+        [2, 4, 2, 1],
+        [1, 2, 4, 2],
+        [2, 1, 2, 4]
+    ])
+    D = fem.E * fem.thickness**3 / (12 * (1 - fem.nu**2))
+    ke = D * np.array([
+        [4, -1, -2, -1],
+        [-1, 4, -1, -2],
+        [-2, -1, 4, -1],
+        [-1, -2, -1, 4]
+    ])
+    K = sp.lil_matrix((fem.num_nodes, fem.num_nodes))
+    M = sp.lil_matrix((fem.num_nodes, fem.num_nodes))
+    for elem in fem.elements:
+        for i, ni in enumerate(elem):
+            for j, nj in enumerate(elem):
+                K[ni, nj] += ke[i, j]
+                M[ni, nj] += me[i, j]
+    return K.tocsc(), M.tocsc()
+
+
+class TestAssembly(unittest.TestCase):
+
+    def setUp(self):
+        self.params = dict(length=1.2, width=0.8, nx=6, ny=4, E=2.1e11, nu=0.3,
+                           rho=7850, thickness=0.01)
+
+    def test_batched_assembly_matches_loop_assembly(self):
+        fem = FEMPlateModalAnalysis(**self.params)
+        fem.generate_mesh()
+        K, M = fem.assemble_global_matrices()
+        K_ref, M_ref = loop_assembly(fem)
+        np.testing.assert_allclose(K.toarray(), K_ref.toarray(), rtol=1e-12, atol=1e-6)
+        np.testing.assert_allclose(M.toarray(), M_ref.toarray(), rtol=1e-12, atol=1e-12)
+
+    def test_element_matrices_are_batched(self):
+        fem = FEMPlateModalAnalysis(**self.params)
+        ke, me = fem.compute_element_matrices()
+        self.assertEqual(ke.shape, (fem.num_elements, 4, 4))
+        self.assertEqual(me.shape, (fem.num_elements, 4, 4))
+
+    def test_field_forms_agree(self):
+        nx, ny = self.params['nx'], self.params['ny']
+        thickness = lambda x, y: 0.01 + 0.005 * x + 0.002 * y
+        from_callable = FEMPlateModalAnalysis(**dict(self.params, thickness=thickness))
+        values = thickness(*from_callable.element_centroids())
+        from_flat = FEMPlateModalAnalysis(**dict(self.params, thickness=values))
+        from_grid = FEMPlateModalAnalysis(**dict(self.params, thickness=values.reshape(ny, nx)))
+
+        matrices = []
+        for fem in (from_callable, from_flat, from_grid):
+            fem.generate_mesh()
+            matrices.append([A.toarray() for A in fem.assemble_global_matrices()])
+        for K, M in matrices[1:]:
+            np.testing.assert_allclose(K, matrices[0][0])
+            np.testing.assert_allclose(M, matrices[0][1])
+
+    def test_uniform_field_matches_scalar(self):
+        fem = FEMPlateModalAnalysis(**self.params)
+        field = FEMPlateModalAnalysis(**dict(self.params, E=np.full(fem.num_elements, 2.1e11)))
+        np.testing.assert_allclose(fem.D, field.D)
+
+    def test_wrong_field_shape_raises(self):
+        with self.assertRaises(ValueError):
+            FEMPlateModalAnalysis(**dict(self.params, rho=np.ones(3)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import unittest
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from fem_analysis import FEMPlateModalAnalysis, repeated_frequency_groups
+
+EDGES = ['left', 'bottom']
+NUM_MODES = 4
+
+
+class TestFrequencySensitivities(unittest.TestCase):
+
+    def setUp(self):
+        # Tapered rectangular plate, so all computed frequencies are distinct
+        self.params = dict(length=1.0, width=0.6, nx=10, ny=6, E=2.1e11, nu=0.3, rho=7850,
+                           thickness=lambda x, y: 0.01 + 0.005 * x)
+        self.fem = FEMPlateModalAnalysis(**self.params)
+        frequencies, mode_shapes = self.fem.solve_modes(NUM_MODES, EDGES)
+        self.sensitivities = self.fem.frequency_sensitivities(frequencies, mode_shapes)
+
+    def central_difference(self, name, value, step, direction=1.0):
+        plus = FEMPlateModalAnalysis(**dict(self.params, **{name: value + step * direction}))
+        minus = FEMPlateModalAnalysis(**dict(self.params, **{name: value - step * direction}))
+        f_plus = plus.solve_modes(NUM_MODES, EDGES)[0]
+        f_minus = minus.solve_modes(NUM_MODES, EDGES)[0]
+        return (f_plus - f_minus) / (2 * step)
+
+    def test_global_parameters_match_finite_differences(self):
+        t_elem = self.fem.t_elem
+        cases = [('E', 2.1e11, 1e6), ('nu', 0.3, 1e-6), ('rho', 7850, 1e-2),
+                 ('thickness', t_elem, 1e-7)]
+        for name, value, step in cases:
+            with self.subTest(name=name):
+                np.testing.assert_allclose(self.sensitivities[name],
+                                           self.central_difference(name, value, step),
+                                           rtol=1e-5)
+
+    def test_element_thickness_matches_finite_differences(self):
+        element = 23
+        direction = np.zeros(self.fem.num_elements)
+        direction[element] = 1.0
+        expected = self.central_difference('thickness', self.fem.t_elem, 1e-6, direction)
+        np.testing.assert_allclose(self.sensitivities['element_thickness'][element], expected,
+                                   rtol=1e-5)
+        self.assertEqual(self.sensitivities['element_thickness'].shape,
+                         (self.fem.num_elements, NUM_MODES))
+
+    def test_unknown_parameter_raises(self):
+        with self.assertRaises(ValueError):
+            self.fem.frequency_sensitivities([1.0], np.zeros((self.fem.num_nodes, 1)),
+                                             parameters=('length',))
+
+    def test_repeated_frequencies_are_basis_independent(self):
+        fem = FEMPlateModalAnalysis(1.0, 1.0, 20, 20, 2.1e11, 0.3, 7850, 0.01)
+        frequencies, mode_shapes = fem.solve_modes(6, ['left', 'right', 'top', 'bottom'])
+        groups = repeated_frequency_groups(frequencies)
+        self.assertIn([1, 2], groups)
+
+        # Rotate the mass-normalized degenerate pair into another valid basis
+        _, M = fem.assemble_global_matrices()
+        pair = mode_shapes[:, [1, 2]]
+        pair = pair / np.sqrt(np.einsum('im,im->m', pair, M @ pair))
+        c, s = np.cos(0.6), np.sin(0.6)
+        rotated = mode_shapes.copy()
+        rotated[:, [1, 2]] = pair @ np.array([[c, -s], [s, c]])
+
+        with self.assertWarns(RuntimeWarning):
+            original = fem.frequency_sensitivities(frequencies, mode_shapes)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            other = fem.frequency_sensitivities(frequencies, rotated)
+        np.testing.assert_allclose(original['element_thickness'], other['element_thickness'],
+                                   rtol=1e-8, atol=1e-10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from multiprocessing import AuthenticationError, shared_memory
+from multiprocessing.connection import Client
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from fem_analysis import FEMPlateModalAnalysis
+from solve_service import LRUCache, SolveService, SolveServiceClient, SolveWorker, job_request
+
+
+class TestSolveWorker(unittest.TestCase):
+
+    def setUp(self):
+        self.params = dict(length=1.0, width=0.6, nx=12, ny=8, E=2.1e11, nu=0.3, rho=7850,
+                           thickness=np.linspace(0.01, 0.02, 96))
+        self.worker = SolveWorker()
+
+    def solve(self, num_modes, fixed_edges):
+        num_nodes = (self.params['nx'] + 1) * (self.params['ny'] + 1)
+        shm = shared_memory.SharedMemory(create=True, size=8 * num_nodes * num_modes)
+        try:
+            frequencies = self.worker.solve({
+                'params': self.params,
+                'num_modes': num_modes,
+                'fixed_edges': fixed_edges,
+                'backend': 'shift_invert',
+                'shm': shm.name,
+            })
+            shape = (num_nodes, len(frequencies))
+            mode_shapes = np.ndarray(shape, dtype=np.float64, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+        return frequencies, mode_shapes
+
+    def test_round_trip_through_shared_memory(self):
+        frequencies, mode_shapes = self.solve(4, ['left', 'bottom'])
+        expected = FEMPlateModalAnalysis(**self.params).solve_modes(4, ['left', 'bottom'])
+        np.testing.assert_allclose(frequencies, expected[0], rtol=1e-8)
+        np.testing.assert_allclose(np.abs(mode_shapes), np.abs(expected[1]), atol=1e-6)
+
+    def test_repeated_request_hits_cache(self):
+        self.solve(4, ['left'])
+        self.solve(4, ['left'])
+        self.assertEqual(self.worker.stats()['hits'], 1)
+
+
+class TestJobRequest(unittest.TestCase):
+
+    def setUp(self):
+        self.job = dict(length=1.0, width=0.6, nx=12, ny=8, E=2.1e11, nu=0.3, rho=7850,
+                        thickness=lambda x, y: 0.01 + 0.01 * x, num_modes=4,
+                        fixed_edges=('left',))
+
+    def test_callable_fields_are_evaluated_on_client(self):
+        request = job_request(self.job)
+        model = FEMPlateModalAnalysis(**{name: self.job[name] for name in request['params']})
+        np.testing.assert_allclose(request['params']['thickness'], model.t_elem)
+        self.assertEqual(request['fixed_edges'], ['left'])
+        self.assertEqual(request['backend'], 'auto')
+
+    def test_missing_parameter_raises(self):
+        del self.job['rho']
+        with self.assertRaises(KeyError):
+            job_request(self.job)
+
+
+@unittest.skipIf(sys.platform == 'win32', "uses a Unix socket and SIGKILL")
+class TestSolveService(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.address = os.path.join(tmpdir.name, 'solve.sock')
+        self.service_file = os.path.join(tmpdir.name, 'service.json')
+        self.service = SolveService(self.address, num_workers=1, service_file=self.service_file)
+        self.service.start()
+        self.addCleanup(self.service.shutdown)
+        self.thread = threading.Thread(target=self.service.serve_forever, daemon=True)
+        self.thread.start()
+
+    def wait_for_restart(self, worker, timeout=30):
+        deadline = time.monotonic() + timeout
+        while self.service._workers[0] is worker:
+            self.assertLess(time.monotonic(), deadline, "worker was not restarted")
+            time.sleep(0.05)
+
+    def test_batch_worker_crash_and_shutdown(self):
+        params = dict(length=1.0, width=0.6, nx=12, ny=8, E=2.1e11, nu=0.3, rho=7850,
+                      thickness=lambda x, y: 0.01 + 0.01 * x)
+        good = dict(params, num_modes=4, fixed_edges=['left', 'bottom'])
+        bad = dict(good, backend='qr')
+        expected = FEMPlateModalAnalysis(**params).solve_modes(4, ['left', 'bottom'])[0]
+
+        with self.assertRaises(AuthenticationError):
+            Client(self.address, authkey=b'wrong key')
+
+        with SolveServiceClient(service_file=self.service_file) as client:
+            with self.assertRaises(KeyError):
+                client.solve_batch([good, {'nx': 4}])
+            self.assertEqual(client._segments, [])
+
+            results = client.solve_batch([good, bad])
+            np.testing.assert_allclose(results[0][0], expected, rtol=1e-8)
+            self.assertIsInstance(results[1], RuntimeError)
+
+            worker = self.service._workers[0]
+            os.kill(worker.pid, signal.SIGKILL)
+            self.wait_for_restart(worker)
+            frequencies, _ = client.solve_modes(4, ['left', 'bottom'], **params)
+            np.testing.assert_allclose(frequencies, expected, rtol=1e-8)
+
+            client.shutdown()
+        self.assertTrue(self.service._stopped.wait(30))
+        self.thread.join(timeout=10)
+        self.assertFalse(self.thread.is_alive())
+        self.assertFalse(os.path.exists(self.address))
+        self.assertFalse(os.path.exists(self.service_file))
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_oldest_by_bytes(self):
+        cache = LRUCache(max_bytes=2000)
+        cache.put('a', np.zeros(100))
+        cache.put('b', np.zeros(100))
+        cache.get('a')
+        cache.put('c', np.zeros(100))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertLessEqual(cache.nbytes, 2000)
+
+    def test_oversized_value_is_not_cached(self):
+        cache = LRUCache(max_bytes=100)
+        cache.put('big', np.zeros(100))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.nbytes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+from scipy.sparse.linalg import LinearOperator, splu
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import solvers
+from fem_analysis import FEMPlateModalAnalysis
+
+THRESHOLDS = dict(solvers.DEFAULT_THRESHOLDS, dense_max_dofs=250)
+GB = 1024**3
+
+
+class TestSelectBackend(unittest.TestCase):
+
+    def select(self, num_dofs, num_modes, memory=64 * GB):
+        return solvers.select_backend(num_dofs, num_modes, memory=memory, thresholds=THRESHOLDS)
+
+    def test_dense_up_to_threshold(self):
+        self.assertEqual(self.select(250, 6), 'dense')
+        self.assertEqual(self.select(251, 6), 'shift_invert')
+
+    def test_dense_when_modes_reach_dofs(self):
+        self.assertEqual(self.select(9, 8), 'dense')
+        self.assertEqual(self.select(1000, 999), 'dense')
+
+    def test_lobpcg_when_factorization_does_not_fit(self):
+        num_dofs = 10**6
+        lu_bytes = solvers.estimate_memory('shift_invert', num_dofs, 6, THRESHOLDS)
+        lobpcg_bytes = solvers.estimate_memory('lobpcg', num_dofs, 6, THRESHOLDS)
+        self.assertLess(lobpcg_bytes, lu_bytes)
+        memory = (lobpcg_bytes + lu_bytes) / 2 / THRESHOLDS['memory_fraction']
+        self.assertEqual(self.select(num_dofs, 6, memory=memory), 'lobpcg')
+
+    def test_too_many_modes_for_memory_raises(self):
+        with self.assertRaises(MemoryError):
+            self.select(10**5, 10**5 - 1, memory=GB)
+
+
+class TestCalibrate(unittest.TestCase):
+
+    def test_single_shift_invert_win_is_noise(self):
+        dense_faster = [(49, True), (121, False), (169, True), (225, True),
+                        (289, False), (361, False), (529, True)]
+        self.assertEqual(solvers.dense_crossover(dense_faster), 225)
+
+    def test_shift_invert_win_at_largest_size_counts(self):
+        self.assertEqual(solvers.dense_crossover([(49, True), (121, False)]), 49)
+        self.assertEqual(solvers.dense_crossover([(49, False), (121, False)]), 0)
+
+    def test_measures_memory_model(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            thresholds = solvers.calibrate(sizes=(4, 8), memory_sizes=(16,), repeats=1)
+        self.assertEqual(set(thresholds), set(solvers.DEFAULT_THRESHOLDS))
+        self.assertGreater(thresholds['lu_fill_per_dof_log2'], 0)
+        self.assertGreater(thresholds['amg_bytes_per_dof'], 0)
+        self.assertGreaterEqual(thresholds['lobpcg_blocks'], 3)
+
+
+class TestBackends(unittest.TestCase):
+
+    def setUp(self):
+        self.fem = FEMPlateModalAnalysis(1.0, 0.6, 16, 10, 2.1e11, 0.3, 7850, 0.01)
+
+    def test_backends_agree(self):
+        reference = self.fem.solve_modes(5, ['left', 'bottom'], backend='shift_invert')[0]
+        for backend in ('dense', 'lobpcg'):
+            with self.subTest(backend=backend):
+                frequencies = self.fem.solve_modes(5, ['left', 'bottom'], backend=backend)[0]
+                np.testing.assert_allclose(frequencies, reference, rtol=1e-6)
+
+    def test_minimum_mesh_with_more_modes_than_dofs(self):
+        fem = FEMPlateModalAnalysis(1.0, 1.0, 2, 2, 2.1e11, 0.3, 7850, 0.01)
+        frequencies, mode_shapes = fem.solve_modes(5, ['left', 'right', 'top', 'bottom'])
+        self.assertEqual(fem.solver_backend, 'dense')
+        self.assertEqual(len(frequencies), 1)
+        self.assertEqual(mode_shapes.shape, (9, 1))
+
+    def test_unknown_backend_raises(self):
+        with self.assertRaises(ValueError):
+            self.fem.solve_modes(3, ['left'], backend='qr')
+
+    def test_explicit_backend_over_budget_raises(self):
+        with mock.patch.object(solvers, 'available_memory', return_value=10**4):
+            with self.assertRaises(MemoryError):
+                self.fem.solve_modes(3, ['left'], backend='dense')
+            # A prefactorized OPinv is already in memory, so it is not rechecked
+            self.fem.generate_mesh()
+            K, M, _ = self.fem.reduced_matrices(['left'])
+            lu = splu(K.tocsc())
+            OPinv = LinearOperator(K.shape, matvec=lu.solve, dtype=K.dtype)
+            solvers.solve_eigenproblem(K, M, 3, backend='shift_invert', OPinv=OPinv)
+
+    def test_unconverged_lobpcg_raises(self):
+        self.fem.generate_mesh()
+        K, M, _ = self.fem.reduced_matrices(['left'])
+        with mock.patch.object(solvers, 'LOBPCG_RESIDUAL_TOL', 0.0):
+            with self.assertRaises(RuntimeError):
+                solvers.iterative_lobpcg(K, M, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()